@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
 from typing import Literal, Optional, Dict
 
 from dotenv import load_dotenv
@@ -13,6 +14,7 @@ load_dotenv()
 Provider = Literal["openai", "gemini", "none"]
 
 
+@lru_cache(maxsize=1)
 def get_provider() -> Provider:
     provider = os.getenv("MODEL_PROVIDER", "none").strip().lower()
     if provider in ("openai", "gemini"):
@@ -20,6 +22,7 @@ def get_provider() -> Provider:
     return "none"  # type: ignore[return-value]
 
 
+@lru_cache(maxsize=1)
 def get_api_keys() -> Dict[str, Optional[str]]:
     return {
         "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
@@ -27,15 +30,25 @@ def get_api_keys() -> Dict[str, Optional[str]]:
     }
 
 
-def validate_keys() -> tuple[bool, str]:
-    provider = get_provider()
-    keys = get_api_keys()
+def refresh() -> None:
+    """Drop cached env reads; call after changing provider or keys at runtime."""
+    get_provider.cache_clear()
+    get_api_keys.cache_clear()
+
+
+def validate_keys(
+    provider: Optional[Provider] = None,
+    keys: Optional[Dict[str, Optional[str]]] = None,
+) -> tuple[bool, str]:
+    """Check the provider has its key; defaults to the environment's provider and keys."""
+    provider = provider or get_provider()
+    keys = get_api_keys() if keys is None else keys
 
     if provider == "openai":
-        if not keys["OPENAI_API_KEY"]:
+        if not keys.get("OPENAI_API_KEY"):
             return False, "OPENAI_API_KEY is not set."
     elif provider == "gemini":
-        if not keys["GOOGLE_API_KEY"]:
+        if not keys.get("GOOGLE_API_KEY"):
             return False, "GOOGLE_API_KEY is not set."
     return True, "OK"
 
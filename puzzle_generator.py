@@ -8,7 +8,8 @@ Built with GitHub Copilot assistance for creative problem-solving and code struc
 import argparse
 import json
 import random
-from typing import List, Dict, Literal
+from collections import defaultdict
+from typing import Iterable, List, Dict, Literal
 
 # Puzzle templates (can be expanded with Copilot's help)
 PUZZLE_TEMPLATES = {
@@ -68,6 +69,61 @@ DIFFICULTIES = ["easy", "medium", "hard"]
 CATEGORIES = ["general", "logic", "math", "wordplay"]
 
 
+# Column-wise view of the templates: row i of _DIFF/_CAT describes _PUZZLES[i].
+# Pools hold row numbers, so selection never touches the puzzle dicts themselves.
+_PUZZLES: List[Dict] = [p for puzzles in PUZZLE_TEMPLATES.values() for p in puzzles]
+_DIFF: List[str] = [p["difficulty"] for p in _PUZZLES]
+_CAT: List[str] = [p["category"] for p in _PUZZLES]
+
+
+def _build_index():
+    """Group template rows by (difficulty, category) and by difficulty, once at import."""
+    by_key: Dict[tuple, List[int]] = defaultdict(list)
+    by_diff: Dict[str, List[int]] = defaultdict(list)
+    for row, (diff, cat) in enumerate(zip(_DIFF, _CAT)):
+        by_key[(diff, cat)].append(row)
+        by_diff[diff].append(row)
+    return dict(by_key), dict(by_diff), list(range(len(_PUZZLES)))
+
+
+# Prebuilt row pools so lookups are dict hits instead of rescanning every template
+_INDEX, _BY_DIFF, _ALL = _build_index()
+
+
+def _floyd_sample(population: List[int], k: int) -> List[int]:
+    """Pick k distinct items with Floyd's algorithm (O(k) draws, no population copy)."""
+    randrange = random.randrange  # local binding for the hot loop
+    n = len(population)
+    seen: set[int] = set()
+    picked: List[int] = []
+    for j in range(n - k, n):
+        t = randrange(j + 1)
+        if t in seen:
+            t = j
+        seen.add(t)
+        picked.append(population[t])
+    return picked
+
+
+def _reservoir_sample(stream: Iterable[int], k: int) -> List[int]:
+    """Pick up to k items uniformly from an iterable in one pass (Algorithm R)."""
+    randrange = random.randrange  # local binding for the hot loop
+    reservoir: List[int] = []
+    for i, item in enumerate(stream):
+        if i < k:
+            reservoir.append(item)
+        else:
+            j = randrange(i + 1)
+            if j < k:
+                reservoir[j] = item
+    return reservoir
+
+
+# When a pass needs more than this share of its pool, one streaming reservoir pass
+# is cheaper than materializing the remaining rows for Floyd's algorithm
+_RESERVOIR_RATIO = 0.5
+
+
 def generate_puzzle(
     difficulty: Literal["easy", "medium", "hard"] = "medium",
     category: str = "general"
@@ -88,23 +144,12 @@ def generate_puzzle(
     if category not in CATEGORIES:
         raise ValueError(f"Category must be one of: {CATEGORIES}")
     
-    # Find matching puzzles
-    matching_puzzles = []
-    for puzzle_type, puzzles in PUZZLE_TEMPLATES.items():
-        for puzzle in puzzles:
-            if puzzle["difficulty"] == difficulty and puzzle["category"] == category:
-                matching_puzzles.append(puzzle)
-    
-    # Fallback: if no exact match, get any puzzle of the requested difficulty
-    if not matching_puzzles:
-        for puzzle_type, puzzles in PUZZLE_TEMPLATES.items():
-            for puzzle in puzzles:
-                if puzzle["difficulty"] == difficulty:
-                    matching_puzzles.append(puzzle)
+    # Exact match first, then any puzzle of the requested difficulty
+    matching_puzzles = _INDEX.get((difficulty, category)) or _BY_DIFF.get(difficulty)
     
     # Return random puzzle or a default
     if matching_puzzles:
-        return random.choice(matching_puzzles)
+        return _PUZZLES[random.choice(matching_puzzles)]
     else:
         return {
             "question": "What has a head and a tail but no body?",
@@ -133,47 +178,44 @@ def generate_puzzles(
     if count < 1 or count > 100:
         raise ValueError("Count must be between 1 and 100")
     
-    # Build pools to sample without replacement, preferring exact matches first
-    exact_pool: List[Dict] = []
-    same_diff_pool: List[Dict] = []
-    any_pool: List[Dict] = []
+    # Pools to sample without replacement, preferring exact matches first
+    exact_pool = _INDEX.get((difficulty, category), [])
+    same_diff_pool = _BY_DIFF.get(difficulty, [])
+    any_pool = _ALL
 
-    for puzzles in PUZZLE_TEMPLATES.values():
-        for p in puzzles:
-            any_pool.append(p)
-            if p["difficulty"] == difficulty:
-                same_diff_pool.append(p)
-                if p["category"] == category:
-                    exact_pool.append(p)
+    selected: List[int] = []
+    chosen: set[int] = set()
 
-    # Helper to sample unique items from a pool excluding already chosen
-    def take_from(pool: List[Dict], chosen: List[Dict], k: int) -> None:
-        remaining = [p for p in pool if p not in chosen]
-        if not remaining or k <= 0:
+    # Helper to sample unique rows from a pool excluding already chosen
+    def take_from(pool: List[int], k: int) -> None:
+        if not pool or k <= 0:
             return
-        if len(remaining) <= k:
-            chosen.extend(remaining)
+        if k > len(pool) * _RESERVOIR_RATIO:
+            picked = _reservoir_sample((row for row in pool if row not in chosen), k)
         else:
-            chosen.extend(random.sample(remaining, k))
+            remaining = [row for row in pool if row not in chosen]
+            picked = remaining if len(remaining) <= k else _floyd_sample(remaining, k)
+        selected.extend(picked)
+        chosen.update(picked)
 
-    selected: List[Dict] = []
     # 1) exact category + difficulty
-    take_from(exact_pool, selected, count)
+    take_from(exact_pool, count)
     # 2) broaden to same difficulty across categories
     if len(selected) < count:
-        take_from(same_diff_pool, selected, count - len(selected))
+        take_from(same_diff_pool, count - len(selected))
     # 3) broaden to any remaining templates
     if len(selected) < count:
-        take_from(any_pool, selected, count - len(selected))
+        take_from(any_pool, count - len(selected))
 
     # If still short (very small template set), allow replacement as last resort
+    choice = random.choice
     while len(selected) < count:
-        selected.append(random.choice(any_pool))
+        selected.append(choice(any_pool))
 
     # Trim and shuffle to avoid a fixed first puzzle
     selected = selected[:count]
     random.shuffle(selected)
-    return selected
+    return [_PUZZLES[row] for row in selected]
 
 
 def format_output(puzzles: List[Dict], output_format: str = "text") -> str:
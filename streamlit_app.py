@@ -1,16 +1,32 @@
+import asyncio
+import html
+import importlib.util
 import json
 import os
+from functools import lru_cache
 from io import BytesIO
+from typing import Optional, Sequence
 
+import numpy as np
+import orjson
 import streamlit as st
 from PIL import Image, ImageDraw, ImageFont
 import random
 import re
+import threading
 
 from puzzle_generator import generate_puzzles, DIFFICULTIES, CATEGORIES
 from config import get_provider, validate_keys
 
 
+# Option tuples and their positions, built once instead of list.index() per rerun
+_PROVIDERS = ("none", "openai", "gemini")
+_PROVIDER_IDX = {p: i for i, p in enumerate(_PROVIDERS)}
+_FORMATS = ("text", "json")
+_FORMAT_IDX = {f: i for i, f in enumerate(_FORMATS)}
+_DIFF_IDX = {d: i for i, d in enumerate(DIFFICULTIES)}
+_CAT_IDX = {c: i for i, c in enumerate(CATEGORIES)}
+
 # Visual palette and emojis per category
 CATEGORY_COLORS = {
     "general": (99, 102, 241),   # indigo
@@ -26,21 +42,48 @@ EMOJI = {
     "wordplay": "🔤",
 }
 
+# Solving tips per category; make_hint always includes one of these
+_CATEGORY_TIPS = {
+    "logic": (
+        "Think process of elimination",
+        "Consider order and state changes",
+        "Test simple cases first",
+    ),
+    "math": (
+        "Estimate before you compute",
+        "Watch units and totals",
+        "Look for symmetry",
+    ),
+    "wordplay": (
+        "Listen to sounds, not spelling",
+        "Homophones might help",
+        "Think prefixes and suffixes",
+    ),
+    "general": (
+        "Lateral thinking helps",
+        "Focus on the key noun",
+        "Rephrase the question",
+    ),
+}
+_DEFAULT_TIPS = ("Follow the clues closely",)
+
 
 def make_hint(answer: str, category: str) -> list[str]:
     """Return 3 short, randomized hints based on the answer and category."""
     ans = (answer or "").strip()
-    letters = [c for c in ans if c.isalpha()]
-    words = [w for w in ans.split() if w]
-    uniq_letters = sorted(set([c.upper() for c in letters]))
+    letters = "".join(filter(str.isalpha, ans))
+    words = ans.split()
+    upper = letters.upper()
+    uniq_letters = sorted(set(upper))
 
     structural: list[str] = []
     if letters:
-        structural.append(f"Starts with: {letters[0].upper()}")
-        structural.append(f"Ends with: {letters[-1].upper()}")
+        structural.append(f"Starts with: {upper[0]}")
+        structural.append(f"Ends with: {upper[-1]}")
         structural.append(f"Letters: {len(letters)}")
         # Vowels/consonants if applicable
-        vowels = sum(1 for c in letters if c.lower() in "aeiou")
+        lowered = letters.lower()
+        vowels = sum(lowered.count(v) for v in "aeiou")
         consonants = len(letters) - vowels
         if vowels:
             structural.append(f"Vowels: {vowels}")
@@ -55,31 +98,8 @@ def make_hint(answer: str, category: str) -> list[str]:
         if len(words) > 1:
             structural.append(f"Words: {len(words)} · Letters: {len(letters)}")
 
-    category_tips = {
-        "logic": [
-            "Think process of elimination",
-            "Consider order and state changes",
-            "Test simple cases first",
-        ],
-        "math": [
-            "Estimate before you compute",
-            "Watch units and totals",
-            "Look for symmetry",
-        ],
-        "wordplay": [
-            "Listen to sounds, not spelling",
-            "Homophones might help",
-            "Think prefixes and suffixes",
-        ],
-        "general": [
-            "Lateral thinking helps",
-            "Focus on the key noun",
-            "Rephrase the question",
-        ],
-    }
-
     # Always include exactly one category tip and 2 random structural hints (if available)
-    tip = random.choice(category_tips.get(category, ["Follow the clues closely"]))
+    tip = random.choice(_CATEGORY_TIPS.get(category, _DEFAULT_TIPS))
     chosen: list[str] = []
     if structural:
         k = 2 if len(structural) >= 2 else 1
@@ -88,157 +108,356 @@ def make_hint(answer: str, category: str) -> list[str]:
     return chosen
 
 
+@lru_cache(maxsize=32)
+def _font(path: str, size: int):
+    """Load a TrueType font once per (path, size); fall back to PIL's default."""
+    try:
+        return ImageFont.truetype(path, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+# Clue card size in pixels
+_CARD_W, _CARD_H = 960, 260
+
+
+@lru_cache(maxsize=16)
+def _gradient(rgb: tuple[int, int, int], w: int, h: int) -> np.ndarray:
+    """Vertical gradient from the category colour down to near-black, built once per colour."""
+    alpha = (np.arange(h) / h)[:, None]
+    rows = (np.array(rgb) * (1 - alpha) + 18 * alpha).astype(np.uint8)
+    out = np.empty((h, w, 3), dtype=np.uint8)
+    out[:] = rows[:, None, :]
+    # Shared between calls; Image.fromarray copies RGB data, so drawing never touches it
+    out.setflags(write=False)
+    return out
+
+
+@st.cache_resource(show_spinner=False)
+def _warm() -> bool:
+    """Load fonts and category gradients once per process, before the first Generate."""
+    _font("arial.ttf", 44)
+    _font("arial.ttf", 24)
+    _font("seguiemj.ttf", 64)
+    for rgb in CATEGORY_COLORS.values():
+        _gradient(rgb, _CARD_W, _CARD_H)
+    return True
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
 def clue_image(puzzle_index: int, category: str, difficulty: str, answer: str) -> bytes:
-    w, h = 960, 260
-    base = Image.new("RGB", (w, h), (15, 15, 18))
+    w, h = _CARD_W, _CARD_H
+    rgb = CATEGORY_COLORS.get(category, (99, 102, 241))
+    base = Image.fromarray(_gradient(rgb, w, h), "RGB")
     draw = ImageDraw.Draw(base)
 
-    r, g, b = CATEGORY_COLORS.get(category, (99, 102, 241))
-    for y in range(h):
-        alpha = y / h
-        color = (
-            int(r * (1 - alpha) + 18 * alpha),
-            int(g * (1 - alpha) + 18 * alpha),
-            int(b * (1 - alpha) + 18 * alpha),
-        )
-        draw.line([(0, y), (w, y)], fill=color)
-
-    try:
-        font_title = ImageFont.truetype("arial.ttf", 44)
-        font_hint = ImageFont.truetype("arial.ttf", 24)
-        font_big = ImageFont.truetype("seguiemj.ttf", 64)
-    except Exception:
-        font_title = ImageFont.load_default()
-        font_hint = ImageFont.load_default()
-        font_big = ImageFont.load_default()
+    font_title = _font("arial.ttf", 44)
+    font_hint = _font("arial.ttf", 24)
+    font_big = _font("seguiemj.ttf", 64)
 
     title = f"Puzzle {puzzle_index}: {category.title()}"
     draw.text((28, 26), title, fill=(245, 245, 255), font=font_title)
     draw.text((28, 86), f"Difficulty: {difficulty.upper()}", fill=(235, 240, 240), font=font_hint)
     draw.text((820, 24), EMOJI.get(category, "💡"), fill=(255, 255, 255), font=font_big)
 
-    y0 = 130
-    for line in make_hint(answer, category):
-        draw.text((28, y0), f"• {line}", fill=(235, 240, 240), font=font_hint)
-        y0 += 28
+    hints = "\n".join(f"• {line}" for line in make_hint(answer, category))
+    draw.multiline_text((28, 130), hints, fill=(235, 240, 240), font=font_hint, spacing=4)
 
     buf = BytesIO()
-    base.save(buf, format="PNG")
+    # Fast deflate: the gradient compresses well even at level 1
+    base.save(buf, format="PNG", compress_level=1, optimize=False)
     return buf.getvalue()
 
 
+_SDK_MODULES = {"openai": "openai", "gemini": "google.generativeai"}
+
+
+@lru_cache(maxsize=4)
 def _sdk_available(provider: str) -> bool:
-    try:
-        if provider == "openai":
-            import openai  # type: ignore  # noqa: F401
-        elif provider == "gemini":
-            import google.generativeai as genai  # type: ignore  # noqa: F401
+    """Check the SDK is installed without importing it; it loads on first Generate."""
+    module = _SDK_MODULES.get(provider)
+    if module is None:
         return True
-    except Exception:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
         return False
 
 
+_FENCE_RE = re.compile(r"```(?:json)?\s*([\[{].*?[\]}])\s*```", re.DOTALL | re.IGNORECASE)
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def _unwrap_items(obj):
+    """Return the puzzle list from a wrapper object like {"items": [...]}, else obj."""
+    if isinstance(obj, dict):
+        for key in ["items", "puzzles", "data", "result"]:
+            if key in obj and isinstance(obj[key], list):
+                return obj[key]
+    return obj
+
+
 def _safe_json_from_text(text: str):
     """Extract JSON array from raw LLM text, handling fenced code blocks."""
     if not text:
         return None
     s = text.strip()
-    # Extract between triple backticks if present
-    if "```" in s:
-        parts = s.split("```")
-        # try to find a json block
-        for i in range(len(parts)):
-            block = parts[i]
-            if block.lstrip().lower().startswith("json"):
-                candidate = parts[i + 1] if i + 1 < len(parts) else block
-                s = candidate
-                break
-        else:
-            # no explicit json tag; take the first fenced content
-            s = parts[1] if len(parts) > 1 else s
-    # Try direct JSON first
+    # Fast path: JSON response modes usually return clean JSON with no fences
     try:
-        obj = json.loads(s)
-        if isinstance(obj, dict):
-            for key in ["items", "puzzles", "data", "result"]:
-                if key in obj and isinstance(obj[key], list):
-                    return obj[key]
-        return obj
-    except Exception:
+        return _unwrap_items(json.loads(s))
+    except ValueError:
         pass
 
+    # Extract the first fenced JSON block (```json ... ``` or bare ```) if present
+    m = _FENCE_RE.search(s)
+    if m:
+        s = m.group(1)
+        try:
+            return _unwrap_items(json.loads(s))
+        except ValueError:
+            pass
+
     # Try to pull the first JSON array from the text
-    m_start = s.find("[")
-    m_end = s.rfind("]")
-    if m_start != -1 and m_end != -1 and m_end > m_start:
+    m = _JSON_ARRAY_RE.search(s)
+    if m:
         try:
-            return json.loads(s[m_start:m_end + 1])
-        except Exception:
+            return json.loads(m.group(0))
+        except ValueError:
             pass
     return None
 
 
-def _generate_puzzles_via_ai(count: int, difficulty: str, category: str, provider: str):
-    """Generate puzzles via OpenAI or Gemini; fallback to templates on failure."""
+# Larger AI requests are split into shards of this size and sent concurrently
+_AI_SHARD_SIZE = 5
+# Per-request timeout handed to the provider SDKs
+_AI_TIMEOUT_S = 60.0
+
+
+def _shard_counts(count: int) -> list[int]:
+    """Split a puzzle count into shard sizes, e.g. 12 -> [5, 5, 2]."""
+    full, rest = divmod(count, _AI_SHARD_SIZE)
+    return [_AI_SHARD_SIZE] * full + ([rest] if rest else [])
+
+
+# Each concurrent shard draws its puzzles from a different theme, so parallel
+# requests don't converge on the same handful of classics
+_SHARD_THEMES = ("everyday objects", "nature and animals", "numbers and time", "places and people")
+
+
+def _user_prompt(count: int, difficulty: str, category: str, shard: Optional[int] = None) -> str:
+    theme = "" if shard is None else f"Draw every puzzle from the theme '{_SHARD_THEMES[shard % len(_SHARD_THEMES)]}'. "
+    return (
+        f"Generate {count} unique puzzles for category='{category}' and difficulty='{difficulty}'. "
+        f"{theme}Avoid well-known classic riddles. "
+        "Each question 1-2 sentences max. Respond as a JSON object with an 'items' array only."
+    )
+
+
+class _JsonItemScanner:
+    """Incrementally pick complete objects out of JSON arrays as text streams in.
+
+    Tracks string/escape state and nesting depth across chunks, so each puzzle
+    dict in ``{"items": [...]}`` is parsed as soon as its closing brace arrives.
+    The accumulated text stays available in ``text`` for the final full parse.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._stack: list[str] = []
+        self._in_str = False
+        self._escaped = False
+        self._start = -1
+        self._start_depth = 0
+
+    def feed(self, chunk: str) -> list:
+        begin = len(self.text)
+        self.text += chunk
+        buf = self.text
+        items = []
+        for i in range(begin, len(buf)):
+            ch = buf[i]
+            if self._in_str:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{" or ch == "[":
+                if ch == "{" and self._start == -1 and self._stack and self._stack[-1] == "[":
+                    self._start = i
+                    self._start_depth = len(self._stack)
+                self._stack.append(ch)
+            elif ch == "}" or ch == "]":
+                if self._stack:
+                    self._stack.pop()
+                if self._start != -1 and len(self._stack) == self._start_depth:
+                    try:
+                        items.append(json.loads(buf[self._start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._start = -1
+        return items
+
+
+async def _gather_texts(calls) -> tuple[list, list]:
+    """Await provider calls concurrently; return (texts, errors), raising if none succeed.
+
+    Calls run in worker threads, which cannot be cancelled from here, so each SDK
+    request carries its own ``_AI_TIMEOUT_S`` timeout instead of a wait_for.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    texts = [r for r in results if not isinstance(r, BaseException)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if not texts:
+        raise errors[0]
+    return texts, errors
+
+
+def _error_text(e: BaseException) -> str:
+    """User-facing reason for a provider failure; timeouts often stringify to ''."""
+    if isinstance(e, TimeoutError):
+        return f"timed out after {_AI_TIMEOUT_S:.0f}s"
+    return str(e) or type(e).__name__
+
+
+# genai.configure is process-wide; hold this while configuring and pinning a client
+_GENAI_CONFIG_LOCK = threading.Lock()
+
+
+# Clients are keyed by raw API key, so bound how many (and how long) are kept alive
+@st.cache_resource(show_spinner=False, max_entries=16, ttl=3600)
+def _get_client(provider: str, api_key: str):
+    """Provider SDK client for one session's key, built once and reused across reruns.
+
+    The key comes from the caller's session_state, never os.environ, so each session
+    talks to the provider as itself. Sync clients are cached on purpose: async clients bind their
+    connection pool to the event loop that first used them, and each generation runs
+    in a fresh asyncio.run loop. Shards still overlap by running in worker threads.
+    """
+    if provider == "openai":
+        from openai import OpenAI  # type: ignore
+        return OpenAI(api_key=api_key, timeout=_AI_TIMEOUT_S)
+    if provider == "gemini":
+        import google.generativeai as genai  # type: ignore
+        from google.generativeai import client as genai_client  # type: ignore
+
+        model = genai.GenerativeModel("gemini-pro", generation_config={"response_mime_type": "application/json"})
+        with _GENAI_CONFIG_LOCK:
+            genai.configure(api_key=api_key)
+            # GenerativeModel otherwise resolves the global client lazily at call time,
+            # by which point another session may have configured its own key
+            model._client = genai_client.get_default_generative_client()
+        return model
+    raise ValueError(f"No SDK client for provider '{provider}'")
+
+
+async def _openai_texts(client, system: str, users: list[str], on_item) -> tuple[list, list]:
+    loop = asyncio.get_running_loop()
+
+    def one(user: str):
+        stream = client.chat.completions.create(
+            model="gpt-4o-mini",
+            temperature=0.9,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            stream=True,
+        )
+        scanner = _JsonItemScanner()
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                for item in scanner.feed(delta):
+                    # Report back on the script thread, where Streamlit calls are allowed
+                    loop.call_soon_threadsafe(on_item, item)
+        return scanner.text
+
+    return await _gather_texts([asyncio.to_thread(one, u) for u in users])
+
+
+async def _gemini_texts(model, system: str, users: list[str]) -> tuple[list, list]:
+    def one(user: str):
+        resp = model.generate_content(f"{system}\n\n{user}", request_options={"timeout": _AI_TIMEOUT_S})
+        return getattr(resp, "text", None)
+
+    return await _gather_texts([asyncio.to_thread(one, u) for u in users])
+
+
+def _generate_puzzles_via_ai(count: int, difficulty: str, category: str, provider: str, api_key: str) -> tuple[list[dict], str]:
+    """Generate puzzles via OpenAI or Gemini; fallback to templates on failure.
+
+    Returns the puzzles and the generation source label shown in the results.
+    """
     count = max(1, min(int(count), 20))
     system = (
         "You create short, self-contained puzzles. "
         "Return ONLY strict JSON (no markdown). Schema: {\"items\": [ {\"question\": str, \"answer\": str, \"difficulty\": 'easy|medium|hard', \"category\": 'general|logic|math|wordplay' } ]}."
     )
-    user = (
-        f"Generate {count} unique puzzles for category='{category}' and difficulty='{difficulty}'. "
-        "Each question 1-2 sentences max. Respond as a JSON object with an 'items' array only."
-    )
+    # One prompt per shard so the provider calls overlap instead of running back to back
+    users = [_user_prompt(n, difficulty, category, shard=i) for i, n in enumerate(_shard_counts(count))]
 
-    text = None
+    texts: list = []
+    failed: list = []
     if provider == "openai":
+        # Surface puzzles as they stream in instead of waiting for the full response
+        progress = st.progress(0.0, text="Waiting for the model…")
+        received = 0
+
+        def on_item(item) -> None:
+            nonlocal received
+            received += 1
+            question = str(item.get("question", "")) if isinstance(item, dict) else ""
+            progress.progress(min(received / count, 1.0), text=f"Received {received}/{count}: {question[:80]}")
+
         try:
             try:
-                from openai import OpenAI  # type: ignore
-                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    temperature=0.9,
-                    response_format={"type": "json_object"},
-                    messages=[
-                        {"role": "system", "content": system},
-                        {"role": "user", "content": user},
-                    ],
-                )
-                text = resp.choices[0].message.content
+                texts, failed = asyncio.run(_openai_texts(_get_client(provider, api_key), system, users, on_item))
             except Exception:
                 import openai  # type: ignore
-                openai.api_key = os.getenv("OPENAI_API_KEY")
                 resp = openai.ChatCompletion.create(
+                    api_key=api_key,
                     model="gpt-3.5-turbo",
                     temperature=0.9,
                     response_format={"type": "json_object"},
                     messages=[
                         {"role": "system", "content": system},
-                        {"role": "user", "content": user},
+                        {"role": "user", "content": _user_prompt(count, difficulty, category)},
                     ],
+                    request_timeout=_AI_TIMEOUT_S,
                 )
-                text = resp.choices[0].message["content"]
+                texts = [resp.choices[0].message["content"]]
         except Exception as e:
-            st.session_state["last_generation_source"] = "ai-failed-openai"
-            st.warning(f"OpenAI call failed: {e}. Falling back to templates.")
+            st.warning(f"OpenAI call failed: {_error_text(e)}. Falling back to templates.")
+        progress.empty()
     elif provider == "gemini":
         try:
-            import google.generativeai as genai  # type: ignore
-            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-            model = genai.GenerativeModel("gemini-pro", generation_config={"response_mime_type": "application/json"})
-            resp = model.generate_content(f"{system}\n\n{user}")
-            text = getattr(resp, "text", None)
+            texts, failed = asyncio.run(_gemini_texts(_get_client(provider, api_key), system, users))
         except Exception as e:
-            st.session_state["last_generation_source"] = "ai-failed-gemini"
-            st.warning(f"Gemini call failed: {e}. Falling back to templates.")
+            st.warning(f"Gemini call failed: {_error_text(e)}. Falling back to templates.")
+
+    if failed:
+        st.warning(
+            f"{len(failed)} of {len(users)} {provider} requests failed ({_error_text(failed[0])}); "
+            "missing puzzles are filled from templates."
+        )
 
-    parsed = _safe_json_from_text(text or "")
-    if isinstance(parsed, list) and parsed:
-        # Normalize fields and clip to requested count; dedupe by question
+    parsed: list = []
+    for text in texts:
+        items = _safe_json_from_text(text or "")
+        if isinstance(items, list):
+            parsed.extend(items)
+    if parsed:
+        # Normalize fields and dedupe by question across every shard, then clip to count
         normalized = []
-        seen_q = set()
-        for item in parsed[:count]:
+        seen_q: set[str] = set()
+        for item in parsed:
+            if len(normalized) >= count:
+                break
             if not isinstance(item, dict):
                 continue
             q = str(item.get("question", "")).strip()
@@ -247,7 +466,7 @@ def _generate_puzzles_via_ai(count: int, difficulty: str, category: str, provide
             c = str(item.get("category", category)).lower()
             if not q or not a:
                 continue
-            key = q.lower()
+            key = q.casefold()
             if key in seen_q:
                 continue
             seen_q.add(key)
@@ -266,25 +485,49 @@ def _generate_puzzles_via_ai(count: int, difficulty: str, category: str, provide
             extras = generate_puzzles(count=need, difficulty=difficulty, category=category)
             # ensure uniqueness vs normalized
             for e in extras:
-                if e["question"].lower() not in seen_q:
+                ek = e["question"].casefold()
+                if ek not in seen_q:
                     normalized.append(e)
-                    seen_q.add(e["question"].lower())
+                    seen_q.add(ek)
                 if len(normalized) >= count:
                     break
         if normalized:
-            st.session_state["last_generation_source"] = f"ai-{provider}"
-            return normalized[:count]
+            return normalized[:count], f"ai-{provider}"
 
     # Fallback to local templates
-    st.session_state["last_generation_source"] = "templates-fallback"
-    return generate_puzzles(count=count, difficulty=difficulty, category=category)
+    return generate_puzzles(count=count, difficulty=difficulty, category=category), "templates-fallback"
+
+
+_KEY_NAMES = ("OPENAI_API_KEY", "GOOGLE_API_KEY")
+_PROVIDER_KEY_NAME = {"openai": "OPENAI_API_KEY", "gemini": "GOOGLE_API_KEY"}
+# Keys from .env / the launch environment, captured once. Sessions seed from this
+# snapshot and never write back, so one user's applied key can't reach another.
+_STARTUP_KEYS = {name: os.getenv(name, "") for name in _KEY_NAMES}
+
+# Static sidebar copy, built once at import rather than on every rerun
+_SECURITY_NOTE = (
+    "Keys entered here are used only for this running session and are not saved to disk. "
+    "For permanent config, edit .env locally."
+)
+_NO_PROVIDER_NOTE = "Using offline templates unless you switch to a provider."
+_PROVIDER_READY_NOTE = "Provider and key are set. You can use AI generation."
+
+
+def _key_fingerprint() -> int:
+    """Cheap cache key that changes whenever a provider key is (re)applied."""
+    return hash("\0".join(st.session_state.get(name, "") for name in _KEY_NAMES))
 
 
-def _env_or(default_value: str, env_name: str, allowed: list[str]) -> str:
+def _env_or(default_value: str, env_name: str, allowed: Sequence[str]) -> str:
     val = os.getenv(env_name, default_value)
     return val if val in allowed else default_value
 
 
+def _serialize_json(puzzles: list[dict]) -> bytes:
+    """Indented JSON bytes for a puzzle set."""
+    return orjson.dumps(puzzles, option=orjson.OPT_INDENT_2)
+
+
 def _puzzles_to_csv(puzzles: list[dict]) -> str:
     import csv
     from io import StringIO
@@ -297,41 +540,128 @@ def _puzzles_to_csv(puzzles: list[dict]) -> str:
     return buf.getvalue()
 
 
+def _card_fields(index: int, p: dict) -> tuple:
+    """Everything a text card needs, resolved once per puzzle instead of per rerun.
+
+    The template dicts are shared module data and also feed the JSON/CSV downloads,
+    so display fields live alongside them rather than being written into them.
+    """
+    body = (
+        f"**Question**\n\n{html.escape(p['question'])}\n\n"
+        f"<details><summary>Show answer</summary>\n\n> 💡 {html.escape(p['answer'])}\n\n</details>\n\n---"
+    )
+    return index, p.get("category", "general"), p.get("difficulty", "medium"), p.get("answer", ""), body
+
+
+def _paint_card(card: tuple) -> None:
+    index, cat, diff, answer, body = card
+    st.image(clue_image(puzzle_index=index, category=cat, difficulty=diff, answer=answer))
+    # One markdown delta per card instead of separate question/expander/info/divider widgets
+    st.markdown(body, unsafe_allow_html=True)
+
+
+def _render_results(puzzles: list[dict], output_format: str, downloads: tuple[bytes, str], cards=None):
+    """Render a puzzle set in the chosen format, with its prebuilt (JSON, CSV) downloads.
+
+    Returns the precomputed text cards (None until text mode has been shown once);
+    pass them back in to skip rebuilding them.
+    """
+    st.subheader("Results")
+    src = st.session_state.get("last_generation_source", "templates")
+    if src.startswith("ai-"):
+        st.caption(f"Source: AI ({src.split('-')[-1]})")
+    elif src == "templates-fallback":
+        st.caption("Source: Templates (AI requested but fell back)")
+        st.info("Couldn’t parse a valid response from the model; using templates instead.")
+    else:
+        st.caption("Source: Templates (offline)")
+    # JSON bytes feed the downloads directly, their text feeds st.code
+    payload, csv_text = downloads
+    if output_format == "json":
+        st.code(payload.decode(), language="json")
+        st.download_button(
+            label="Download JSON",
+            data=payload,
+            file_name="puzzles.json",
+            mime="application/json",
+        )
+    else:
+        if cards is None:
+            cards = [_card_fields(i, p) for i, p in enumerate(puzzles, start=1)]
+        for card in cards:
+            _paint_card(card)
+
+    # Always offer downloads
+    dl_cols = st.columns(2)
+    with dl_cols[0]:
+        st.download_button(
+            label="⬇️ Download JSON",
+            data=payload,
+            file_name="puzzles.json",
+            mime="application/json",
+        )
+    with dl_cols[1]:
+        st.download_button(
+            label="⬇️ Download CSV",
+            data=csv_text,
+            file_name="puzzles.csv",
+            mime="text/csv",
+        )
+    return cards
+
+
+@st.fragment
+def render_results(results_key: tuple, puzzles: list[dict], output_format: str) -> None:
+    """Results panel as a fragment, so its own widgets (the downloads) rerun only this block.
+
+    Fragment reruns replay the original arguments, hence ``puzzles`` must be a list;
+    the downloads and text cards built on the first pass are picked back up from
+    session_state.
+    """
+    stored = st.session_state.get("_puzzles", (None,))
+    if stored[0] == results_key and stored[1] is puzzles:
+        cards, downloads = stored[2], stored[3]
+    else:
+        # Serialize once per set; plain calls beat st.cache_data, which rehashes the set
+        cards, downloads = None, (_serialize_json(puzzles), _puzzles_to_csv(puzzles))
+    cards = _render_results(puzzles, output_format, downloads, cards)
+    st.session_state["_puzzles"] = (results_key, puzzles, cards, downloads)
+
+
 def main():
-    st.set_page_config(page_title="Puzzle Generator", page_icon="🧩", layout="wide")
+    st.set_page_config(page_title="Puzzle Generator", page_icon="🧩", layout="centered")
 
     st.title("🧩 Puzzle Generator – AgentsLeague - CreativeApps")
     st.caption("Creative Apps Track · Built with GitHub Copilot")
 
     hero = st.container()
     results = st.container()
+    _warm()
 
     with st.sidebar:
         st.header("Provider & Keys")
-        current_provider = get_provider()
+        # Keys live in session state; seed them from the startup snapshot once per session
+        for name in _KEY_NAMES:
+            if name not in st.session_state:
+                st.session_state[name] = _STARTUP_KEYS[name]
         provider = st.selectbox(
-            "Model provider", ["none", "openai", "gemini"],
-            index=["none", "openai", "gemini"].index(current_provider),
+            "Model provider", _PROVIDERS,
+            index=_PROVIDER_IDX[get_provider()],
+            key="MODEL_PROVIDER",
         )
-        os.environ["MODEL_PROVIDER"] = provider
-        st.session_state["MODEL_PROVIDER"] = provider
 
         if provider == "openai":
-            default_key = st.session_state.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY", "")
-            openai_key = st.text_input("OpenAI API Key", value=default_key, type="password", placeholder="sk-...")
+            openai_key = st.text_input("OpenAI API Key", value=st.session_state["OPENAI_API_KEY"], type="password", placeholder="sk-...")
             if st.button("Apply Key", key="apply_openai"):
                 if openai_key:
-                    os.environ["OPENAI_API_KEY"] = openai_key
                     st.session_state["OPENAI_API_KEY"] = openai_key
                     st.success("OpenAI key applied for this session.")
                 else:
                     st.warning("No key entered.")
         elif provider == "gemini":
-            default_key = st.session_state.get("GOOGLE_API_KEY") or os.getenv("GOOGLE_API_KEY", "")
-            gemini_key = st.text_input("Gemini API Key", value=default_key, type="password", placeholder="AIza...")
+            gemini_key = st.text_input("Gemini API Key", value=st.session_state["GOOGLE_API_KEY"], type="password", placeholder="AIza...")
             if st.button("Apply Key", key="apply_gemini"):
                 if gemini_key:
-                    os.environ["GOOGLE_API_KEY"] = gemini_key
                     st.session_state["GOOGLE_API_KEY"] = gemini_key
                     st.success("Gemini key applied for this session.")
                 else:
@@ -339,36 +669,46 @@ def main():
         else:
             st.caption("Provider set to none – keys not required.")
 
-        ok, msg = validate_keys()
-        if provider == "none":
-            st.caption("Using offline templates unless you switch to a provider.")
-        elif ok:
-            st.success("Provider and key are set. You can use AI generation.")
+        key_hash = _key_fingerprint()
+        # Per-session copy keyed by (provider, key_hash) so validation and the status
+        # banner text are only rebuilt when that pair changes
+        validation = st.session_state.get("_validation")
+        if validation and validation[0] == (provider, key_hash):
+            (ok, msg), banner = validation[1], validation[2]
         else:
-            st.warning(msg + " — falling back to templates if AI mode is chosen.")
+            ok, msg = validate_keys(provider, {name: st.session_state.get(name) for name in _KEY_NAMES})
+            if provider == "none":
+                banner = ("caption", _NO_PROVIDER_NOTE)
+            elif ok:
+                banner = ("success", _PROVIDER_READY_NOTE)
+            else:
+                banner = ("warning", msg + " — falling back to templates if AI mode is chosen.")
+            st.session_state["_validation"] = ((provider, key_hash), (ok, msg), banner)
+        # Streamlit only shows what this run emits, so the banner itself is still drawn
+        getattr(st, banner[0])(banner[1])
         # Diagnostics
         with st.expander("Diagnostics", expanded=False):
             st.caption(f"SDK available: {'yes' if _sdk_available(provider) else 'no'}")
-            masked = 'yes' if (os.getenv('OPENAI_API_KEY') or os.getenv('GOOGLE_API_KEY')) else 'no'
+            masked = 'yes' if any(st.session_state.get(name) for name in _KEY_NAMES) else 'no'
             st.caption(f"Key detected in session: {masked}")
         with st.popover("Security note"):
-            st.write("Keys entered here are used only for this running session and are not saved to disk. For permanent config, edit .env locally.")
+            st.markdown(_SECURITY_NOTE)
 
         st.divider()
         st.header("Controls")
         # Defaults from .env on first load; Streamlit keeps state via keys thereafter
         dflt_diff = _env_or("medium", "PUZZLE_DIFFICULTY", DIFFICULTIES)
         dflt_cat = _env_or("general", "PUZZLE_CATEGORY", CATEGORIES)
-        dflt_fmt = _env_or("text", "OUTPUT_FORMAT", ["text", "json"])
+        dflt_fmt = _env_or("text", "OUTPUT_FORMAT", _FORMATS)
         try:
             dflt_count = max(1, min(50, int(os.getenv("PUZZLE_COUNT", "5"))))
         except Exception:
             dflt_count = 5
 
         count = st.number_input("How many puzzles?", min_value=1, max_value=50, value=dflt_count, key="ui_count")
-        difficulty = st.selectbox("Difficulty", DIFFICULTIES, index=DIFFICULTIES.index(dflt_diff), key="ui_difficulty")
-        category = st.selectbox("Category", CATEGORIES, index=CATEGORIES.index(dflt_cat), key="ui_category")
-        output_format = st.radio("Format", ["text", "json"], index=["text","json"].index(dflt_fmt), horizontal=True, key="ui_format")
+        difficulty = st.selectbox("Difficulty", DIFFICULTIES, index=_DIFF_IDX[dflt_diff], key="ui_difficulty")
+        category = st.selectbox("Category", CATEGORIES, index=_CAT_IDX[dflt_cat], key="ui_category")
+        output_format = st.radio("Format", _FORMATS, index=_FORMAT_IDX[dflt_fmt], horizontal=True, key="ui_format")
         # Let users choose generation source. AI option visible even if keys missing; we'll fallback gracefully.
         mode_label = "AI model (OpenAI/Gemini)" if (provider in ("openai", "gemini")) else "AI model (enable provider to use)"
         gen_mode = st.radio(
@@ -385,71 +725,30 @@ def main():
         st.session_state["_auto_generated"] = True
         generate = True
 
+    # Results survive unrelated reruns (expanders, format flips) until the inputs change
+    results_key = (count, difficulty, category, provider, use_ai)
+    stored = st.session_state.get("_puzzles", (None,))
+
     if generate:
         try:
             if use_ai:
+                # No process-wide cache here: AI sets are per session and session_state
+                # already keeps the current one across reruns
                 with st.spinner("Generating puzzles with AI…"):
-                    puzzles = _generate_puzzles_via_ai(count=count, difficulty=difficulty, category=category, provider=provider)
+                    api_key = st.session_state.get(_PROVIDER_KEY_NAME[provider], "")
+                    puzzles, source = _generate_puzzles_via_ai(count, difficulty, category, provider, api_key)
             else:
-                puzzles = generate_puzzles(count=count, difficulty=difficulty, category=category)
-                st.session_state["last_generation_source"] = "templates"
+                puzzles, source = generate_puzzles(count=count, difficulty=difficulty, category=category), "templates"
+            st.session_state["last_generation_source"] = source
             with results:
-                st.subheader("Results")
-                src = st.session_state.get("last_generation_source", "templates")
-                if src.startswith("ai-"):
-                    st.caption(f"Source: AI ({src.split('-')[-1]})")
-                elif src == "templates-fallback":
-                    st.caption("Source: Templates (AI requested but fell back)")
-                    st.info("Couldn’t parse a valid response from the model; using templates instead.")
-                else:
-                    st.caption("Source: Templates (offline)")
-                if output_format == "json":
-                    st.code(json.dumps(puzzles, indent=2), language="json")
-                    st.download_button(
-                        label="Download JSON",
-                        data=json.dumps(puzzles, indent=2),
-                        file_name="puzzles.json",
-                        mime="application/json",
-                    )
-                else:
-                    for i, p in enumerate(puzzles, start=1):
-                        cat = p.get("category", "general")
-                        diff = p.get("difficulty", "medium")
-                        img_bytes = clue_image(
-                            puzzle_index=i,
-                            category=cat,
-                            difficulty=diff,
-                            answer=p.get("answer", ""),
-                        )
-                        st.image(img_bytes)
-                        st.markdown("**Question**")
-                        st.write(p["question"])  
-                        with st.expander("Show answer", expanded=False):
-                            st.info(p["answer"], icon="💡")
-                            st.button("Copy answer", key=f"copy_{i}", help="Copy not available in all browsers")
-                        st.divider()
-
-                # Always offer downloads
-                dl_cols = st.columns(2)
-                with dl_cols[0]:
-                    st.download_button(
-                        label="⬇️ Download JSON",
-                        data=json.dumps(puzzles, indent=2),
-                        file_name="puzzles.json",
-                        mime="application/json",
-                    )
-                with dl_cols[1]:
-                    st.download_button(
-                        label="⬇️ Download CSV",
-                        data=_puzzles_to_csv(puzzles),
-                        file_name="puzzles.csv",
-                        mime="text/csv",
-                    )
-
+                render_results(results_key, puzzles, output_format)
                 # Delight: small confetti on success
                 st.balloons()
         except ValueError as e:
             st.error(f"{e}")
+    elif stored[0] == results_key:
+        with results:
+            render_results(results_key, stored[1], output_format)
     else:
         with hero:
             st.subheader("Welcome 👋")